@@ -23,9 +23,14 @@ import plotly.express as px
 class ResearchTools:
     """研究者工具集 - 5个专业工具"""
     
-    def __init__(self, data_csv: str):
-        self.df = pd.read_csv(data_csv, encoding='utf-8-sig').fillna("")
+    def __init__(self, data_csv: str, df: pd.DataFrame = None):
+        # 调用方已加载过同一份CSV时直接复用，避免重复解析
+        self.df = df if df is not None else pd.read_csv(data_csv, encoding='utf-8-sig').fillna("")
         self.converter_t2s = opencc.OpenCC('t2s')
+        
+        # 数据加载后不再变化：分类与文献计数只统计一次，供各图表工具复用
+        self._resolution_counts = self.df['resolution_type'].value_counts()
+        self._source_counts = self.df['source'].value_counts()
     
     def _normalize_text(self, text: str) -> str:
         """繁简统一"""
@@ -104,14 +109,14 @@ class ResearchTools:
             }
         
         evolution_records = []
-        for _, row in matches.iterrows():
-            text = row['text']
+        rows = matches[['text', 'source', 'resolution_type']].itertuples(index=False, name=None)
+        for text, source, resolution_type in rows:
             dynasties = self._extract_dynasties(text)
             evolution_records.append({
                 "text": text,
-                "source": row['source'],
+                "source": source,
                 "dynasties": dynasties,
-                "resolution_type": row['resolution_type']
+                "resolution_type": resolution_type
             })
         
         return {
@@ -198,7 +203,7 @@ class ResearchTools:
     
     def _plot_resolution_distribution(self) -> Dict[str, Any]:
         """STRONG/WEAK/NONE占比 - 饼状图"""
-        resolution_counts = self.df['resolution_type'].value_counts()
+        resolution_counts = self._resolution_counts
         
         # 创建饼状图
         fig = go.Figure(data=[go.Pie(
@@ -232,7 +237,7 @@ class ResearchTools:
     
     def _plot_source_distribution(self) -> Dict[str, Any]:
         """文献来源分布 - 柱状图"""
-        source_counts = self.df['source'].value_counts().head(10)
+        source_counts = self._source_counts.head(10)
         
         fig = go.Figure(data=[go.Bar(
             x=source_counts.index,
@@ -256,9 +261,9 @@ class ResearchTools:
         return {
             "analysis_type": "source_distribution",
             "data": source_counts.to_dict(),
-            "total_sources": len(self.df['source'].unique()),
+            "total_sources": len(self._source_counts),
             "plot_html": plot_html,
-            "summary": f"共有{len(self.df['source'].unique())}个不同的文献来源"
+            "summary": f"共有{len(self._source_counts)}个不同的文献来源"
         }
     
     def _plot_dynasty_distribution(self) -> Dict[str, Any]:
@@ -6,18 +6,57 @@ Step 4: 数据分析器（增强版）
 3. 提供可查询的数据摘要
 """
 
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import os
 import re
 from pathlib import Path
 from typing import Dict, List, Tuple
 from dataclasses import dataclass
+from datetime import datetime
+import hashlib
 import json
 from config import Config
 
 
+# 子类型判定规则（模块加载时预编译）：按优先级排列，命中的第一条规则决定类型
+STRONG_SUBTYPE_RULES = [
+    ("自然山岳", re.compile(r"山|岭|峰|岩|岳|冈")),
+    ("自然水文", re.compile(r"水|河|江|川|溪|池|湖|潭|源")),
+    ("人物姓氏", re.compile(r"人|王|公|姓|氏|皇|后|妃")),
+    ("历史沿革", re.compile(r"故|旧|改|徙|废|罢|新置")),
+    ("抽象语义", re.compile(r"取.*?之义|取.*?名之|以.*?为名")),
+]
+
+WEAK_SOURCE_RULES = [
+    ("书证引用", re.compile(r"《.*?》")),
+    ("口传记载", re.compile(r"云|曰|谓之")),
+    ("考据注释", re.compile(r"按|注|据")),
+    ("民间传说", re.compile(r"相传|传说")),
+]
+
+NONE_FOCUS_RULES = [
+    ("空间距离", re.compile(r"\d+里|\d+步|距离|远近")),
+    ("户籍经济", re.compile(r"\d+户|\d+口|民|租|调")),
+    ("四至方位", re.compile(r"东|西|南|北|至")),
+    ("政区变更", re.compile(r"置|废|改为|属")),
+]
+
+
+def classify_by_rules(texts: pd.Series, rules: List[Tuple[str, re.Pattern]], default: str) -> pd.Series:
+    """
+    按规则优先级为整列文本打标签（向量化，等价于逐行if/elif）
+    
+    Args:
+        texts: 文本列
+        rules: (标签, 正则) 列表，按优先级排列
+        default: 所有规则均未命中时的标签
+    """
+    conditions = [texts.str.contains(pat, regex=True).to_numpy(dtype=bool) for _, pat in rules]
+    choices = [label for label, _ in rules]
+    return pd.Series(np.select(conditions, choices, default=default), index=texts.index, dtype="category")
+
+
 @dataclass
 class AnalysisInsight:
     """分析洞察数据类"""
@@ -30,29 +69,53 @@ class AnalysisInsight:
 class EnhancedDataAnalyzer:
     """增强版数据分析器 - 生成RAG可用的洞察"""
     
-    def __init__(self, input_file: str, output_dir: str = "results"):
+    # 图表绘制逻辑变更时递增，使旧缓存的图表失效
+    CHART_VERSION = 2
+    
+    def __init__(self, input_file: str, output_dir: str = "results", enable_plots: bool = True, dpi: int = 150):
         """
         初始化分析器
         
         Args:
             input_file: 输入CSV文件（batch_classification_results.csv）
             output_dir: 输出目录
+            enable_plots: 是否生成可视化图表（关闭时不会导入matplotlib/seaborn）
+            dpi: 图表分辨率（三合一深度分析图最高200）
         """
         self.input_file = input_file
+        self.enable_plots = enable_plots
+        self.dpi = dpi
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
         
         # 加载数据
-        self.df = pd.read_csv(input_file, encoding='utf-8-sig').fillna("")
-        self.df['text_len'] = self.df['text'].astype(str).apply(len)
-        
-        # 设置绘图风格
-        sns.set_theme(style="whitegrid")
-        plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'Heiti TC', 'SimHei']
-        plt.rcParams['axes.unicode_minus'] = False
+        self.df = self._load_results(input_file)
+        self.df['text_len'] = self.df['text'].str.len()
+        # 分类标签只有少数几种取值，用category存储以加速比较和分组
+        self.df['resolution_type'] = self.df['resolution_type'].astype('category')
         
         # 存储生成的洞察
         self.insights: List[AnalysisInsight] = []
+        
+        # 缓存各类别子集（含子类型列），供可视化复用
+        self._strong_df = None
+        self._weak_df = None
+        self._none_df = None
+    
+    def _load_results(self, input_file: str) -> pd.DataFrame:
+        """
+        加载分类结果
+        
+        优先读取分类器同步写出的Feather文件（读取更快且保留类型），
+        若不存在或比CSV旧，则用pyarrow引擎解析CSV
+        """
+        csv_path = Path(input_file)
+        feather_path = csv_path.with_suffix(".feather")
+        if feather_path.exists() and (
+            not csv_path.exists() or feather_path.stat().st_mtime >= csv_path.stat().st_mtime
+        ):
+            return pd.read_feather(feather_path).fillna("")
+        return pd.read_csv(csv_path, encoding='utf-8-sig', engine='pyarrow').fillna("")
     
     def run_full_analysis(self):
         """运行完整分析流程"""
@@ -61,20 +124,25 @@ class EnhancedDataAnalyzer:
         # 1. 基础统计
         self._analyze_basic_distribution()
         
+        # 按分类标签一次性切分数据，各类别分析直接使用对应分组
+        groups = dict(list(self.df.groupby('resolution_type', observed=True)))
+        empty_df = self.df.iloc[:0]
+        
         # 2. STRONG类深度分析
-        self._analyze_strong_subtypes()
+        self._analyze_strong_subtypes(groups.get('STRONG', empty_df))
         
         # 3. WEAK类引证分析
-        self._analyze_weak_sources()
+        self._analyze_weak_sources(groups.get('WEAK', empty_df))
         
         # 4. NONE类描述分析
-        self._analyze_none_focus()
+        self._analyze_none_focus(groups.get('NONE', empty_df))
         
         # 5. 综合统计
         self._analyze_comprehensive_stats()
         
         # 6. 生成可视化
-        self._generate_visualizations()
+        if self.enable_plots:
+            self._generate_visualizations()
         
         # 7. 导出RAG友好的文档
         self._export_rag_documents()
@@ -112,28 +180,13 @@ class EnhancedDataAnalyzer:
             data=counts.to_dict()
         ))
     
-    def _analyze_strong_subtypes(self):
+    def _analyze_strong_subtypes(self, strong_df: pd.DataFrame):
         """分析STRONG类的命名逻辑子类"""
-        strong_df = self.df[self.df['resolution_type'] == 'STRONG'].copy()
-        
         if len(strong_df) == 0:
             return
         
-        # 定义子类型分类逻辑
-        def get_strong_subtype(text):
-            if re.search(r"山|岭|峰|岩|岳|冈", text):
-                return "自然山岳"
-            if re.search(r"水|河|江|川|溪|池|湖|潭|源", text):
-                return "自然水文"
-            if re.search(r"人|王|公|姓|氏|皇|后|妃", text):
-                return "人物姓氏"
-            if re.search(r"故|旧|改|徙|废|罢|新置", text):
-                return "历史沿革"
-            if re.search(r"取.*?之义|取.*?名之|以.*?为名", text):
-                return "抽象语义"
-            return "其他"
-        
-        strong_df['logic_type'] = strong_df['text'].apply(get_strong_subtype)
+        strong_df['logic_type'] = classify_by_rules(strong_df['text'], STRONG_SUBTYPE_RULES, "其他")
+        self._strong_df = strong_df
         logic_counts = strong_df['logic_type'].value_counts()
         
         # 生成自然语言描述
@@ -170,26 +223,13 @@ class EnhancedDataAnalyzer:
             encoding='utf-8-sig'
         )
     
-    def _analyze_weak_sources(self):
+    def _analyze_weak_sources(self, weak_df: pd.DataFrame):
         """分析WEAK类的引证特征"""
-        weak_df = self.df[self.df['resolution_type'] == 'WEAK'].copy()
-        
         if len(weak_df) == 0:
             return
         
-        # 定义引证类型
-        def get_weak_source(text):
-            if re.search(r"《.*?》", text):
-                return "书证引用"
-            if re.search(r"云|曰|谓之", text):
-                return "口传记载"
-            if re.search(r"按|注|据", text):
-                return "考据注释"
-            if re.search(r"相传|传说", text):
-                return "民间传说"
-            return "其他引证"
-        
-        weak_df['source_type'] = weak_df['text'].apply(get_weak_source)
+        weak_df['source_type'] = classify_by_rules(weak_df['text'], WEAK_SOURCE_RULES, "其他引证")
+        self._weak_df = weak_df
         source_counts = weak_df['source_type'].value_counts()
         
         # 生成自然语言描述
@@ -214,26 +254,13 @@ class EnhancedDataAnalyzer:
             data=source_counts.to_dict()
         ))
     
-    def _analyze_none_focus(self):
+    def _analyze_none_focus(self, none_df: pd.DataFrame):
         """分析NONE类的描述维度"""
-        none_df = self.df[self.df['resolution_type'] == 'NONE'].copy()
-        
         if len(none_df) == 0:
             return
         
-        # 定义描述重点
-        def get_none_focus(text):
-            if re.search(r"\d+里|\d+步|距离|远近", text):
-                return "空间距离"
-            if re.search(r"\d+户|\d+口|民|租|调", text):
-                return "户籍经济"
-            if re.search(r"东|西|南|北|至", text):
-                return "四至方位"
-            if re.search(r"置|废|改为|属", text):
-                return "政区变更"
-            return "地理特征"
-        
-        none_df['focus_type'] = none_df['text'].apply(get_none_focus)
+        none_df['focus_type'] = classify_by_rules(none_df['text'], NONE_FOCUS_RULES, "地理特征")
+        self._none_df = none_df
         focus_counts = none_df['focus_type'].value_counts()
         
         # 生成自然语言描述
@@ -260,13 +287,15 @@ class EnhancedDataAnalyzer:
     
     def _analyze_comprehensive_stats(self):
         """综合统计分析"""
-        # 文本长度统计
-        length_stats = self.df.groupby('resolution_type')['text_len'].agg([
+        # 文本长度统计（一次groupby同时得到长度统计与记录数，供洞察和摘要共用）
+        group_stats = self.df.groupby('resolution_type', observed=True)['text_len'].agg([
             ('平均长度', 'mean'),
             ('最短', 'min'),
             ('最长', 'max'),
-            ('中位数', 'median')
-        ]).round(1)
+            ('中位数', 'median'),
+            ('数量', 'count')
+        ])
+        length_stats = group_stats[['平均长度', '最短', '最长', '中位数']].round(1)
         
         content = """文本长度综合统计：
 
@@ -293,70 +322,109 @@ class EnhancedDataAnalyzer:
         ))
         
         # 保存统计摘要
-        summary = self.df.groupby('resolution_type').agg({
-            'placename': 'count',
-            'text_len': 'mean'
-        }).rename(columns={'placename': 'Count', 'text_len': 'Avg_Length'})
+        summary = pd.DataFrame({
+            'Count': group_stats['数量'],
+            'Avg_Length': group_stats['平均长度']
+        })
         summary.to_csv(self.output_dir / "analysis_summary.csv", encoding='utf-8-sig')
     
+    def _chart_cache_key(self) -> str:
+        """根据数据内容和分辨率计算图表缓存键"""
+        digest = hashlib.md5(pd.util.hash_pandas_object(self.df, index=False).values.tobytes())
+        digest.update(f"{self.dpi}:{self.CHART_VERSION}".encode())
+        return digest.hexdigest()
+    
+    def _chart_is_current(self, filename: str, cache_key: str) -> bool:
+        """图表已存在且生成时的数据与当前一致"""
+        png_path = self.output_dir / filename
+        key_path = png_path.with_suffix(".md5")
+        return png_path.exists() and key_path.exists() and key_path.read_text() == cache_key
+    
+    def _save_chart(self, fig, filename: str, cache_key: str, dpi: int):
+        """保存图表并记录缓存键"""
+        png_path = self.output_dir / filename
+        fig.savefig(png_path, dpi=dpi, bbox_inches='tight')
+        png_path.with_suffix(".md5").write_text(cache_key)
+    
     def _generate_visualizations(self):
-        """生成可视化图表"""
+        """生成可视化图表（数据未变化的图表直接复用上次的结果）"""
+        cache_key = self._chart_cache_key()
+        pending = {
+            name for name in ("stat_category_pie.png", "stat_length_boxplot.png", "mining_deep_analysis.png")
+            if not self._chart_is_current(name, cache_key)
+        }
+        if not pending:
+            print("📊 数据未变化，复用已有可视化图表")
+            return
+        
+        # 绘图库较重，仅在需要出图时导入；使用非交互的Agg后端批量出图
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+        
         print("📊 正在生成可视化图表...")
         
+        # 设置绘图风格
+        sns.set_theme(style="whitegrid")
+        plt.rcParams['font.sans-serif'] = ['Arial Unicode MS', 'Heiti TC', 'SimHei']
+        plt.rcParams['axes.unicode_minus'] = False
+        
         # 1. 分类分布饼图
-        plt.figure(figsize=(10, 8))
-        counts = self.df['resolution_type'].value_counts()
-        plt.pie(counts, labels=counts.index, autopct='%1.1f%%', 
-                startangle=140, colors=sns.color_palette("pastel"))
-        plt.title("地名记录分类分布", fontsize=16, fontweight='bold')
-        plt.savefig(self.output_dir / "stat_category_pie.png", dpi=300, bbox_inches='tight')
-        plt.close()
+        if "stat_category_pie.png" in pending:
+            fig, ax = plt.subplots(figsize=(10, 8))
+            counts = self.df['resolution_type'].value_counts()
+            ax.pie(counts, labels=counts.index, autopct='%1.1f%%', 
+                   startangle=140, colors=sns.color_palette("pastel"))
+            ax.set_title("地名记录分类分布", fontsize=16, fontweight='bold')
+            self._save_chart(fig, "stat_category_pie.png", cache_key, self.dpi)
+            plt.close(fig)
         
         # 2. 文本长度箱线图
-        plt.figure(figsize=(10, 6))
-        sns.boxplot(x='resolution_type', y='text_len', data=self.df, palette="Set2")
-        plt.title("各类别文本长度分布", fontsize=16, fontweight='bold')
-        plt.xlabel("分类标签", fontsize=12)
-        plt.ylabel("字符长度", fontsize=12)
-        plt.savefig(self.output_dir / "stat_length_boxplot.png", dpi=300, bbox_inches='tight')
-        plt.close()
+        if "stat_length_boxplot.png" in pending:
+            fig, ax = plt.subplots(figsize=(10, 6))
+            # resolution_type为category类型，seaborn默认按类别排序；显式指定为出现顺序，与原图一致
+            box_order = list(self.df['resolution_type'].unique())
+            sns.boxplot(x='resolution_type', y='text_len', data=self.df, order=box_order,
+                        palette="Set2", ax=ax)
+            ax.set_title("各类别文本长度分布", fontsize=16, fontweight='bold')
+            ax.set_xlabel("分类标签", fontsize=12)
+            ax.set_ylabel("字符长度", fontsize=12)
+            self._save_chart(fig, "stat_length_boxplot.png", cache_key, self.dpi)
+            plt.close(fig)
         
         # 3. 三合一深度分析图
-        fig, axes = plt.subplots(1, 3, figsize=(20, 7))
-        
-        # STRONG子类型
-        strong_df = self.df[self.df['resolution_type'] == 'STRONG'].copy()
-        if len(strong_df) > 0:
-            strong_df['logic_type'] = strong_df['text'].apply(self._get_strong_subtype_simple)
-            logic_counts = strong_df['logic_type'].value_counts()
-            sns.barplot(x=logic_counts.index, y=logic_counts.values, 
-                       ax=axes[0], palette="viridis")
-            axes[0].set_title("STRONG类：命名逻辑分布", fontsize=14)
-            axes[0].tick_params(axis='x', rotation=45)
-        
-        # WEAK引证方式
-        weak_df = self.df[self.df['resolution_type'] == 'WEAK'].copy()
-        if len(weak_df) > 0:
-            weak_df['source_type'] = weak_df['text'].apply(self._get_weak_source_simple)
-            weak_counts = weak_df['source_type'].value_counts()
-            axes[1].pie(weak_counts, labels=weak_counts.index, 
-                       autopct='%1.1f%%', startangle=140,
-                       colors=sns.color_palette("pastel"))
-            axes[1].set_title("WEAK类：引证方式", fontsize=14)
-        
-        # NONE描述重点
-        none_df = self.df[self.df['resolution_type'] == 'NONE'].copy()
-        if len(none_df) > 0:
-            none_df['focus_type'] = none_df['text'].apply(self._get_none_focus_simple)
-            none_counts = none_df['focus_type'].value_counts()
-            sns.barplot(x=none_counts.index, y=none_counts.values, 
-                       ax=axes[2], palette="magma")
-            axes[2].set_title("NONE类：描述重点", fontsize=14)
-            axes[2].tick_params(axis='x', rotation=45)
-        
-        plt.tight_layout()
-        plt.savefig(self.output_dir / "mining_deep_analysis.png", dpi=300, bbox_inches='tight')
-        plt.close()
+        if "mining_deep_analysis.png" in pending:
+            fig, axes = plt.subplots(1, 3, figsize=(20, 7))
+            
+            # STRONG子类型（复用_analyze_strong_subtypes的结果）
+            if self._strong_df is not None:
+                logic_counts = self._strong_df['logic_type'].value_counts()
+                # 子类型为category类型，需显式指定顺序以保持按频次降序
+                sns.barplot(x=logic_counts.index, y=logic_counts.values, order=list(logic_counts.index),
+                           ax=axes[0], palette="viridis")
+                axes[0].set_title("STRONG类：命名逻辑分布", fontsize=14)
+                axes[0].tick_params(axis='x', rotation=45)
+            
+            # WEAK引证方式
+            if self._weak_df is not None:
+                weak_counts = self._weak_df['source_type'].value_counts()
+                axes[1].pie(weak_counts, labels=weak_counts.index, 
+                           autopct='%1.1f%%', startangle=140,
+                           colors=sns.color_palette("pastel"))
+                axes[1].set_title("WEAK类：引证方式", fontsize=14)
+            
+            # NONE描述重点
+            if self._none_df is not None:
+                none_counts = self._none_df['focus_type'].value_counts()
+                sns.barplot(x=none_counts.index, y=none_counts.values, order=list(none_counts.index),
+                           ax=axes[2], palette="magma")
+                axes[2].set_title("NONE类：描述重点", fontsize=14)
+                axes[2].tick_params(axis='x', rotation=45)
+            
+            fig.tight_layout()
+            self._save_chart(fig, "mining_deep_analysis.png", cache_key, min(self.dpi, 200))
+            plt.close(fig)
         
         print("可视化图表已生成")
     
@@ -365,18 +433,23 @@ class EnhancedDataAnalyzer:
         print("📄 正在生成RAG知识库文档...")
         
         # 1. 导出为单个Markdown文档
-        md_content = "# 古籍地名数据分析报告\n\n"
-        md_content += f"生成时间: {pd.Timestamp.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"
-        md_content += "---\n\n"
+        # 先收集片段再一次性拼接，避免字符串反复+=
+        md_parts = [
+            "# 古籍地名数据分析报告\n\n",
+            f"生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n",
+            "---\n\n"
+        ]
         
         for insight in self.insights:
-            md_content += f"## {insight.title}\n\n"
-            md_content += f"**类别**: {insight.category}\n\n"
-            md_content += insight.content
-            md_content += "\n\n---\n\n"
+            md_parts.append(
+                f"## {insight.title}\n\n"
+                f"**类别**: {insight.category}\n\n"
+                f"{insight.content}"
+                "\n\n---\n\n"
+            )
         
         with open(self.output_dir / "analysis_insights.md", "w", encoding="utf-8") as f:
-            f.write(md_content)
+            f.write("".join(md_parts))
         
         # 2. 导出为JSON（结构化数据）
         insights_json = [
@@ -411,28 +484,6 @@ class EnhancedDataAnalyzer:
         print(f"  • {self.output_dir / 'analysis_insights.md'}")
         print(f"  • {self.output_dir / 'analysis_insights.json'}")
         print(f"  • {self.output_dir / 'analysis_insights.csv'}")
-    
-    # 辅助方法（简化版分类函数）
-    def _get_strong_subtype_simple(self, text):
-        if re.search(r"山|岭|峰|岩|岳|冈", text): return "自然山岳"
-        if re.search(r"水|河|江|川|溪|池|湖|潭|源", text): return "自然水文"
-        if re.search(r"人|王|公|姓|氏|皇|后|妃", text): return "人物姓氏"
-        if re.search(r"故|旧|改|徙|废|罢|新置", text): return "历史沿革"
-        if re.search(r"取.*?之义|取.*?名之|以.*?为名", text): return "抽象语义"
-        return "其他"
-    
-    def _get_weak_source_simple(self, text):
-        if re.search(r"《.*?》", text): return "书证引用"
-        if re.search(r"云|曰|谓之", text): return "口传记载"
-        if re.search(r"按|注|据", text): return "考据注释"
-        return "其他引证"
-    
-    def _get_none_focus_simple(self, text):
-        if re.search(r"\d+里|\d+步|距离|远近", text): return "空间距离"
-        if re.search(r"\d+户|\d+口|民|租|调", text): return "户籍经济"
-        if re.search(r"东|西|南|北|至", text): return "四至方位"
-        if re.search(r"置|废|改为|属", text): return "政区变更"
-        return "地理特征"
 
 
 def main():
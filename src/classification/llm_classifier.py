@@ -6,25 +6,74 @@ Step 3: LLM分类器（修正版）
 3. 更清晰的运行日志
 """
 
+import numpy as np
 import pandas as pd 
 import os
 import time
+import threading
 import requests
 import re
 import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from requests.adapters import HTTPAdapter
 from config import Config
 
-# 设置环境
-Config.setup_environment()
-
 # 从Config获取配置
 INPUT_CSV = Config.PLACENAME_RECORDS  
 PROGRESS_FILE = Config.BATCH_CLASSIFICATION
+FEATHER_FILE = str(Path(PROGRESS_FILE).with_suffix(".feather"))
 API_KEY = Config.API_KEY
 API_URL = Config.API_BASE_URL + "/chat/completions"
 SELECTED_MODEL = Config.CLASSIFICATION_MODEL
 
 STRONG_PATTERNS = Config.STRONG_PATTERNS
+# 所有STRONG模式合并为一个正则，一次扫描即可判定
+STRONG_REGEX = re.compile("|".join(f"(?:{pat})" for pat in STRONG_PATTERNS))
+
+
+class RateLimiter:
+    """线程安全的限速器：保证相邻两次请求的发起间隔不小于interval秒"""
+    
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+    
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+# 多线程共享的限速器
+RATE_LIMITER = RateLimiter(Config.API_CALL_INTERVAL)
+
+# 中断标志：置位后工作线程不再发起新请求，尽快结束
+STOP_EVENT = threading.Event()
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """获取共享的HTTP会话（首次调用时创建，带连接池和鉴权请求头）"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            adapter = HTTPAdapter(pool_connections=Config.API_MAX_WORKERS, pool_maxsize=Config.API_MAX_WORKERS * 2)
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({
+                "Authorization": f"Bearer {API_KEY}",
+                "Content-Type": "application/json"
+            })
+            _session = session
+    return _session
 
 SYSTEM_PROMPT = """你是一名历史地名学研究中的文本标注助手。
 
@@ -69,53 +118,124 @@ SYSTEM_PROMPT = """你是一名历史地名学研究中的文本标注助手。
 }
 """
 
+# 批量分类：沿用同一套分类标准，仅替换返回格式
+BATCH_SYSTEM_PROMPT = SYSTEM_PROMPT[:SYSTEM_PROMPT.index("仅返回 JSON")] + """输入包含多条编号记录，请逐条独立判断。
+
+仅返回 JSON 数组，每条记录对应一个对象，id 为输入中的记录编号（从1开始，与输入编号一一对应）：
+[
+  {"id": 1, "label": "STRONG | WEAK | NONE", "evidence": "直接支持该判断的原文片段"}
+]
+"""
+
+JSON_OBJECT_RE = re.compile(r'\{.*\}', re.DOTALL)
+JSON_ARRAY_RE = re.compile(r'\[.*\]', re.DOTALL)
+
 def check_strong_by_regex(text):
     """使用正则快速识别STRONG类"""
-    for pat in STRONG_PATTERNS:
-        if re.search(pat, text):
-            return True
-    return False
+    return STRONG_REGEX.search(text) is not None
 
 
-def call_api_single(placename, text):
-    """单条调用API"""
+def request_json(system_prompt, user_content, json_re):
+    """发送一次对话请求并解析返回的JSON（失败重试一次），失败返回None"""
     payload = {
         "model": SELECTED_MODEL,
         "messages": [
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": f"地名：【{placename}】\n文本：{text[:120]}"}
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content}
         ],
         "temperature": 0
     }
-    headers = {
-        "Authorization": f"Bearer {API_KEY}",
-        "Content-Type": "application/json"
-    }
+    session = get_session()
     
     for attempt in range(2):
+        if STOP_EVENT.is_set():
+            return None
         try:
-            response = requests.post(API_URL, json=payload, headers=headers, timeout=30)
+            RATE_LIMITER.wait()
+            response = session.post(API_URL, json=payload, timeout=30)
             if response.status_code != 200:
                 time.sleep(2)
                 continue
             
             content = response.json()['choices'][0]['message']['content']
-            clean_json = re.search(r'\{.*\}', content, re.DOTALL)
+            clean_json = json_re.search(content)
             if clean_json:
-                res = json.loads(clean_json.group())
-                return res.get('label', 'NONE'), res.get('evidence', '')
+                return json.loads(clean_json.group())
         except:
             time.sleep(1)
     
+    return None
+
+
+def call_api_single(placename, text):
+    """单条调用API"""
+    res = request_json(SYSTEM_PROMPT, f"地名：【{placename}】\n文本：{text[:120]}", JSON_OBJECT_RE)
+    if isinstance(res, dict):
+        return res.get('label', 'NONE'), res.get('evidence', '')
     return "ERROR", "API_FAILED"
 
 
+def call_api_batch(records):
+    """
+    批量调用API：一次请求分类多条记录
+    
+    Args:
+        records: [(地名, 文本), ...]
+    
+    返回:
+        与输入顺序一致的[(label, evidence), ...]；
+        批量结果的编号与输入不能一一对应时（如从0编号、缺失或重复），整批退回单条调用，
+        避免标签错位到其他记录上
+    """
+    if len(records) == 1:
+        return [call_api_single(*records[0])]
+    
+    user_content = "\n\n".join(
+        f"{n}. 地名：【{placename}】\n文本：{text[:120]}"
+        for n, (placename, text) in enumerate(records, 1)
+    )
+    res = request_json(BATCH_SYSTEM_PROMPT, user_content, JSON_ARRAY_RE)
+    
+    ids = []
+    by_id = {}
+    if isinstance(res, list):
+        for item in res:
+            try:
+                n = int(item['id'])
+            except (TypeError, KeyError, ValueError):
+                continue
+            ids.append(n)
+            by_id[n] = item
+    
+    # 编号必须恰好是1..len(records)且无重复，否则无法可靠地对应回记录
+    if sorted(ids) != list(range(1, len(records) + 1)):
+        return [call_api_single(placename, text) for placename, text in records]
+    
+    return [(by_id[n].get('label', 'NONE'), by_id[n].get('evidence', '')) for n in range(1, len(records) + 1)]
+
+
+def append_progress(rows):
+    """将新增结果追加写入进度文件（只写新行，不重写已保存的部分）"""
+    if not rows:
+        return
+    pd.DataFrame(rows).to_csv(
+        PROGRESS_FILE,
+        mode='a',
+        header=not os.path.exists(PROGRESS_FILE),
+        index=False,
+        encoding='utf-8-sig'
+    )
+
+
 def main():
     """主函数"""
     print("="*60)
     print("古籍地名分类系统")
     print("="*60)
     
+    # 设置环境（仅在实际运行分类时）
+    Config.setup_environment()
+    
     # 显示配置
     print(f"\n📌 当前配置:")
     print(f"   输入文件: {INPUT_CSV}")
@@ -143,7 +263,7 @@ def main():
     
     # 加载数据
     print(f"\n📖 正在加载数据...")
-    df = pd.read_csv(INPUT_CSV, encoding='utf-8-sig').fillna("")
+    df = pd.read_csv(INPUT_CSV, encoding='utf-8-sig', engine='pyarrow').fillna("")
     print(f"✓ 成功加载 {len(df)} 条记录")
     
     # 加载进度（断点续传）
@@ -158,7 +278,11 @@ def main():
         results = []
         print(f"✓ 从头开始处理")
     
-    remaining = len(df) - len(processed_keys)
+    # 筛选待处理记录：整列拼接去重键后一次性做集合匹配
+    all_keys = df['placename'].astype(str) + df['text'].astype(str).str[:10]
+    todo = np.flatnonzero(~all_keys.isin(processed_keys).to_numpy())
+
+    remaining = len(todo)
     print(f"📝 待处理: {remaining} 条")
     print("\n" + "="*60)
     
@@ -166,38 +290,67 @@ def main():
         print("✅ 所有记录已处理完成！")
         return
 
-    # 处理数据
-    for idx, row in df.iterrows():
-        key = row['placename'] + row['text'][:10]
-        if key in processed_keys:
-            continue
-
-        placename = row['placename']
-        text = row['text']
-        
-        # 优先使用正则匹配（免费）
-        if check_strong_by_regex(text):
-            label, evidence, mode = "STRONG", "Regex Match", "[REGEX]"
-        else:
-            # 调用LLM
-            label, evidence = call_api_single(placename, text)
-            mode = "[LLM  ]"
-            time.sleep(0.6)
-
-        print(f"[{idx+1}/{len(df)}] {mode} {placename[:10]:10s} -> {label:6s}")
-        
-        res_row = row.to_dict()
-        res_row.update({"resolution_type": label, "evidence": evidence})
-        results.append(res_row)
-
-        # 定期保存
-        if (idx + 1) % 5 == 0:
-            pd.DataFrame(results).to_csv(PROGRESS_FILE, index=False, encoding='utf-8-sig')
-
-    # 最终保存
-    print("\n📦 正在保存结果...")
+    # 已写入进度文件的结果条数
+    last_flushed = len(results)
+
+    # 直接遍历列数组，避免iterrows逐行构造Series
+    placenames = df['placename'].to_numpy()
+    texts = df['text'].to_numpy()
+    sources = df['source'].to_numpy()
+
+    # 整列一次性计算正则命中情况（免费的STRONG快速通道）
+    strong_mask = df['text'].str.contains(STRONG_REGEX).to_numpy(dtype=bool)
+
+    # 处理数据：正则命中的直接判定，其余分批提交线程池并发调用LLM，按输入顺序收集结果
+    STOP_EVENT.clear()
+    executor = ThreadPoolExecutor(max_workers=Config.API_MAX_WORKERS)
+    try:
+        # 需要LLM的记录按Config.API_BATCH_SIZE分批，每批一次请求
+        llm_todo = [i for i in todo if not strong_mask[i]]
+        batch_of = {}
+        for start in range(0, len(llm_todo), Config.API_BATCH_SIZE):
+            batch = llm_todo[start:start + Config.API_BATCH_SIZE]
+            future = executor.submit(call_api_batch, [(placenames[i], texts[i]) for i in batch])
+            for pos, i in enumerate(batch):
+                batch_of[i] = (future, pos)
+
+        for i in todo:
+            placename = placenames[i]
+
+            # 优先使用正则匹配（免费）
+            if strong_mask[i]:
+                label, evidence, mode = "STRONG", "Regex Match", "[REGEX]"
+            else:
+                future, pos = batch_of[i]
+                label, evidence = future.result()[pos]
+                mode = "[LLM  ]"
+
+            print(f"[{i+1}/{len(df)}] {mode} {placename[:10]:10s} -> {label:6s}")
+
+            results.append({
+                "placename": placename,
+                "text": texts[i],
+                "source": sources[i],
+                "resolution_type": label,
+                "evidence": evidence
+            })
+
+            # 定期保存（追加模式）
+            if len(results) - last_flushed >= Config.SAVE_FREQUENCY:
+                append_progress(results[last_flushed:])
+                last_flushed = len(results)
+    finally:
+        # 中断时：取消尚未开始的请求、通知运行中的线程停止重试，不等待其结束
+        STOP_EVENT.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+        # 无论正常结束还是中断，都保存尚未写入进度文件的结果
+        print("\n📦 正在保存结果...")
+        append_progress(results[last_flushed:])
+        last_flushed = len(results)
+
     full_df = pd.DataFrame(results)
-    full_df.to_csv(PROGRESS_FILE, index=False, encoding='utf-8-sig')
+    # 同步写出Feather副本，供分析器快速加载
+    full_df.to_feather(FEATHER_FILE)
     
     # 按类型分别保存
     for l in ["STRONG", "WEAK", "NONE"]:
@@ -221,6 +374,7 @@ def main():
     
     print(f"\n💾 输出文件:")
     print(f"   • {PROGRESS_FILE}")
+    print(f"   • {FEATHER_FILE}")
     print(f"   • extracted_STRONG.csv")
     print(f"   • extracted_WEAK.csv")
     print(f"   • extracted_NONE.csv")
@@ -18,8 +18,9 @@ class Config:
     PROJECT_ROOT = Path(__file__).parent
      
     # ==================== API配置 ====================
-    API_KEY = ""
-    API_BASE_URL = ""
+    # 密钥不写入代码，从环境变量读取
+    API_KEY = os.environ.get("SILICONFLOW_API_KEY", "")
+    API_BASE_URL = os.environ.get("SILICONFLOW_BASE_URL", "")
     
     # ==================== 模型配置 ====================
     
@@ -104,6 +105,12 @@ class Config:
     # API调用间隔（秒）
     API_CALL_INTERVAL = 0.6
     
+    # LLM并发请求数
+    API_MAX_WORKERS = 8
+    
+    # 每次LLM请求批量分类的记录数
+    API_BATCH_SIZE = 8
+    
     # 进度保存频率
     SAVE_FREQUENCY = 5
     
@@ -112,12 +119,17 @@ class Config:
     
     # ==================== 辅助方法 ====================
     
+    _environment_ready = False
+    
     @classmethod
     def setup_environment(cls):
-        """设置环境变量（供langchain使用）"""
+        """设置环境变量（供langchain使用），重复调用不会重复设置"""
+        if cls._environment_ready:
+            return
         os.environ["OPENAI_API_KEY"] = cls.API_KEY
         os.environ["OPENAI_BASE_URL"] = cls.API_BASE_URL
         os.environ["PYTHONIOENCODING"] = "utf-8"
+        cls._environment_ready = True
     
     @classmethod
     def ensure_dirs(cls):
@@ -1,8 +1,17 @@
-from bs4 import BeautifulSoup
+from lxml import etree, html as lxml_html
 import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
 from config import Config
 
+# 预编译XPath：匹配class中含有ctext的td节点（与BeautifulSoup的class_="ctext"语义一致）
+CTEXT_XPATH = etree.XPath('//td[contains(concat(" ", normalize-space(@class), " "), " ctext ")]')
+# 节点内的文本，跳过script/style（与BeautifulSoup的get_text一致；XPath的text()本身不含注释）
+CTEXT_TEXT_XPATH = etree.XPath('.//text()[not(ancestor::script or ancestor::style)]')
+# 按UTF-8解析字节流：lxml不接受带编码声明（如<?xml ... encoding=...?>）的str输入
+UTF8_HTML_PARSER = lxml_html.HTMLParser(encoding="utf-8")
+
 class HTMLToTextConverter:
     """HTML转文本转换器"""
     
@@ -11,44 +20,65 @@ class HTMLToTextConverter:
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
     
-    def extract_ctext_text(self, html_content: str) -> str:
-        """从HTML中提取ctext类的文本内容"""
-        soup = BeautifulSoup(html_content, "html.parser")
-        nodes = soup.find_all("td", class_="ctext")
-        texts = [n.get_text(separator="\n", strip=True) for n in nodes]
+    @staticmethod
+    def extract_ctext_text(html_content) -> str:
+        """从HTML（str或UTF-8字节）中提取ctext类的文本内容"""
+        if isinstance(html_content, str):
+            html_content = html_content.encode("utf-8")
+        if not html_content.strip():
+            return ""
+        try:
+            tree = lxml_html.fromstring(html_content, parser=UTF8_HTML_PARSER)
+        except etree.ParserError:
+            # 只有注释、doctype等、没有任何元素的文档：按空内容处理（计为跳过而非失败）
+            return ""
+        texts = [
+            "\n".join(t.strip() for t in CTEXT_TEXT_XPATH(node) if t.strip())
+            for node in CTEXT_XPATH(tree)
+        ]
         return "\n\n".join(texts)
     
     def convert_all(self) -> dict:
-        """转换所有HTML文件，返回统计信息"""
+        """转换所有HTML文件（多进程并行），返回统计信息"""
         html_files = list(self.input_dir.glob("*.html"))
         stats = {"success": 0, "failed": 0, "skipped": 0}
         
-        for i, html_file in enumerate(html_files, 1):
-            print(f"[{i}/{len(html_files)}] 处理: {html_file.name}")
-            
-            try:
-                with open(html_file, "r", encoding="utf-8") as f:
-                    html = f.read()
-                
-                clean_text = self.extract_ctext_text(html)
+        with ProcessPoolExecutor() as executor:
+            outcomes = executor.map(_convert_one, html_files, repeat(self.output_dir))
+            for i, (html_file, (status, error)) in enumerate(zip(html_files, outcomes), 1):
+                print(f"[{i}/{len(html_files)}] 处理: {html_file.name}")
                 
-                # 检查是否提取到内容
-                if not clean_text.strip():
+                if status == "skipped":
                     print(f"  ⚠️  警告: 文件为空，跳过")
-                    stats["skipped"] += 1
-                    continue
-                
-                output_file = self.output_dir / html_file.name.replace(".html", ".txt")
-                with open(output_file, "w", encoding="utf-8") as f:
-                    f.write(clean_text)
+                elif status == "failed":
+                    print(f"  ❌ 错误: {error}")
                 
-                stats["success"] += 1
-            except Exception as e:
-                print(f"  ❌ 错误: {e}")
-                stats["failed"] += 1
+                stats[status] += 1
         
         return stats
 
+
+def _convert_one(html_file: Path, output_dir: Path) -> tuple:
+    """转换单个HTML文件（在子进程中执行），返回(状态, 错误信息)"""
+    try:
+        # 以字节读入，交由lxml按UTF-8解析，兼容带XML声明的页面
+        with open(html_file, "rb") as f:
+            html = f.read()
+        
+        clean_text = HTMLToTextConverter.extract_ctext_text(html)
+        
+        # 检查是否提取到内容
+        if not clean_text.strip():
+            return "skipped", None
+        
+        output_file = output_dir / html_file.name.replace(".html", ".txt")
+        with open(output_file, "w", encoding="utf-8") as f:
+            f.write(clean_text)
+        
+        return "success", None
+    except Exception as e:
+        return "failed", str(e)
+
 def main():
     
     input_path = "/Users/johnjennings/Desktop/地名自动化/"
@@ -1,13 +1,19 @@
 import re
 import csv
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from config import Config
 
 @dataclass
 class PlaceNameRecord:
     """地名记录数据类"""
+    # 记录数量可达数十万条，使用__slots__省去每个实例的__dict__
+    __slots__ = ("placename", "text", "source")
+    
     placename: str
     text: str
     source: str
@@ -21,6 +27,14 @@ class PlaceNameExtractor:
     PREFIX_VERBS = ["置", "改", "分", "析", "移", "隸", "屬", "并", "於", "在", "本", "舊", "今", "尋", "此"]
     STOP_START_WORDS = ["在", "及", "与", "之", "其", "此", "旧", "从", "至", "界", "有", "谓"]
     PLACE_SUFFIXES = ["縣", "州", "郡", "府", "道", "山", "水", "河", "川", "原", "谷", "城", "關", "津", "坡", "陵", "宮", "溪", "岩", "潭"]
+
+    # 朝代按长度降序，供前缀链正则使用
+    _DYN_TUPLE = tuple(sorted(DYNASTIES, key=len, reverse=True))
+    # 停用词与后缀均为单字：集合做成员判断，字典记录后缀优先顺序
+    _STOP_SET = frozenset(STOP_START_WORDS)
+    _SUFFIX_SET = frozenset(PLACE_SUFFIXES)
+    _SUFFIX_RANK = {suffix: rank for rank, suffix in enumerate(PLACE_SUFFIXES)}
+    _DIRECTION_SET = frozenset(["南", "北", "西", "东", "治", "界"])
     
     def __init__(self, input_dir: str):
         self.input_dir = Path(input_dir)
@@ -30,75 +44,52 @@ class PlaceNameExtractor:
         清理行首的朝代、行政区划、动词等前缀
         这是核心的前处理步骤，去除干扰信息
         """
-        # 1. 去除行首数字
-        line = re.sub(r"^\d+\s*", "", line).strip()
-        
-        # 2. 迭代去除朝代、行政区划、动词前缀
-        max_iterations = 10  
-        iteration = 0
+        return line[self._cleaned_start_offset(line):].rstrip()
+    
+    def _cleaned_start_offset(self, line: str) -> int:
+        """返回清理行首前缀后，正文在原行中的起始下标"""
+        # 1. 跳过行首数字及空白
+        pos = _LEADING_NUM_RE.match(line).end()
         
-        while iteration < max_iterations:
-            original = line
-            
-            # 去除朝代
-            for dynasty in self.DYNASTIES:
-                if line.startswith(dynasty):
-                    line = line[len(dynasty):].lstrip(" ；，。")
-            
-            # 去除行政区划（如"某某郡"）
-            for admin in self.ADMIN_LEVELS:
-                match = re.match(rf"^[一-龥]{{1,2}}{admin}", line)
-                if match:
-                    line = line[len(match.group(0)):].lstrip(" ；，。")
-            
-            # 去除动词前缀
-            for verb in self.PREFIX_VERBS:
-                if line.startswith(verb):
-                    line = line[len(verb):].lstrip(" ；，。")
-            
-            # 如果没有变化，说明清理完成
-            if original == line:
-                break
-            
-            iteration += 1
+        # 2. 逐个跳过朝代、行政区划、动词前缀，直到不再匹配任何前缀
+        while match := _PREFIX_CHAIN_RE.match(line, pos):
+            pos = match.end()
         
-        return line
+        return pos
     
-    def extract_valid_placename(self, line: str) -> Optional[str]:
+    def extract_valid_placename(self, line: str) -> Optional[Tuple[str, int]]:
         """
         从清理后的行中提取有效地名
         
         返回:
-            有效地名或None
+            (有效地名, 地名在原行中的结束下标) 或None
         """
-        cleaned_start = self.clean_line_start(line)
+        offset = self._cleaned_start_offset(line)
+        cleaned_start = line[offset:]
         if not cleaned_start:
             return None
         
-        # 查找后缀词
-        for suffix in self.PLACE_SUFFIXES:
-            if suffix not in cleaned_start:
-                continue
-            
-            idx = cleaned_start.find(suffix)
-            potential_name = cleaned_start[:idx+1]
-            
-            # 验证1: 长度必须在2-3之间
-            if not (2 <= len(potential_name) <= 3):
-                continue
-            
-            # 验证2: 不能以停用词开头
-            if any(potential_name.startswith(w) for w in self.STOP_START_WORDS):
+        # 停用词开头的行不可能产生有效地名
+        if cleaned_start[0] in self._STOP_SET:
+            return None
+        
+        # 地名长度限定2-3，后缀只可能位于下标1或2，逐字比较即可；
+        # 每个后缀只取其首次出现位置（与原先的 find 语义一致，与前面字相同的后缀字不算候选）
+        rank = self._SUFFIX_RANK
+        head, second, third = cleaned_start[0], cleaned_start[1:2], cleaned_start[2:3]
+        candidates = []
+        if second in rank and second != head:
+            candidates.append((rank[second], 1))
+        if third in rank and third != head and third != second:
+            candidates.append((rank[third], 2))
+        
+        # 按 PLACE_SUFFIXES 的优先顺序逐个验证（如"巫山縣"优先取"縣"）
+        candidates.sort()
+        for _, idx in candidates:
+            # 如果紧跟方位词，可能是"某某县南"之类的描述，跳过
+            if cleaned_start[idx+1:idx+2] in self._DIRECTION_SET:
                 continue
-            
-            # 验证3: 检查后面的内容
-            after_name = cleaned_start[idx+1:]
-            if after_name and not re.match(r"^[，。；\s]", after_name):
-                # 如果紧跟方位词，可能是"某某县南"之类的描述，跳过
-                if any(after_name.startswith(dir_word) for dir_word in ["南", "北", "西", "东", "治", "界"]):
-                    continue
-            
-            return potential_name
+            return cleaned_start[:idx+1], offset + idx + 1
         
         return None
     
@@ -117,42 +108,21 @@ class PlaceNameExtractor:
             key=lambda x: int(x.stem) if x.stem.isdigit() else x.stem
         )
         
-        for fname in files:
-            print(f"处理文件: {fname.name}")
-            last_place = None
-            
-            with open(fname, "r", encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    
-                    # 尝试提取地名
-                    p_name = self.extract_valid_placename(line)
-                    
-                    if p_name:
-                        # 发现新地名，更新当前地名
-                        last_place = p_name
-                        # 提取地名后的内容
-                        content_start_idx = line.find(p_name) + len(p_name)
-                        content = line[content_start_idx:].lstrip("，。； ")
-                        
-                        # 使用(地名, 来源文件)作为key，避免不同文件中的同名地名冲突
-                        key = (last_place, fname.name)
-                        if key not in aggregated_data:
-                            aggregated_data[key] = []
-                        if content:
-                            aggregated_data[key].append(content)
-                    
-                    elif last_place:
-                        # 没有新地名，但有当前地名，这行属于上一个地名的延续
-                        aggregated_data[(last_place, fname.name)].append(line)
+        # 各文件相互独立，分发到多进程并行处理；key中含来源文件名，合并时不会冲突
+        with ProcessPoolExecutor() as executor:
+            for fname, file_data in zip(files, executor.map(self._process_file, files)):
+                print(f"处理文件: {fname.name}")
+                # 结果经pickle传回后驻留状态已丢失，在主进程合并时驻留来源文件名与地名，
+                # 复用同一字符串对象，降低key的哈希与存储开销
+                src = sys.intern(fname.name)
+                for (p_name, _), texts in file_data.items():
+                    aggregated_data[(sys.intern(p_name), src)] = texts
         
         # 转换为PlaceNameRecord对象
         records = []
         for (name, src), texts in aggregated_data.items():
-            # 去重并合并文本
-            combined_text = " ".join(dict.fromkeys(texts))
+            # 合并文本（已在插入时去重）
+            combined_text = " ".join(texts)
             
             if combined_text:  # 只保留有内容的记录
                 records.append(PlaceNameRecord(
@@ -164,25 +134,67 @@ class PlaceNameExtractor:
         return records
     
     
+    def _process_file(self, fname: Path) -> Dict[Tuple[str, str], Dict[str, None]]:
+        """
+        处理单个文件（在子进程中执行）
+        
+        返回:
+            {(地名, 来源文件): 以dict充当的有序文本集合}
+        """
+        # 每个(地名, 来源文件)对应一个以dict充当的有序集合：插入时即去重，保留首次出现顺序
+        file_data = defaultdict(dict)
+        src = fname.name
+        current_texts = None
+        
+        # 整个文件一次读入，由正则在C层切分出去掉首尾空白的非空行
+        text = fname.read_text(encoding="utf-8")
+        for line_match in _LINE_RE.finditer(text):
+            line = line_match.group(1)
+
+            # 尝试提取地名
+            extracted = self.extract_valid_placename(line)
+            
+            if extracted:
+                # 发现新地名，更新当前地名
+                p_name, name_end = extracted
+                # 提取地名后的内容
+                content = line[name_end:].lstrip("，。； ")
+                
+                # 使用(地名, 来源文件)作为key，避免不同文件中的同名地名冲突
+                current_texts = file_data[(p_name, src)]
+                if content:
+                    current_texts[content] = None
+            
+            elif current_texts is not None:
+                # 没有新地名，但有当前地名，这行属于上一个地名的延续
+                current_texts[line] = None
+        
+        return dict(file_data)
+    
     def validate_and_resolve(self, record: PlaceNameRecord) -> Optional[PlaceNameRecord]:
         """验证并解析地名目标"""
         text = record.text
         original = record.placename
         
-        # 从文本中重新提取候选地名
-        pattern = re.compile(rf"([一-龥]{{1,2}}(?:{'|'.join(self.PLACE_SUFFIXES)}))")
-        candidates = pattern.findall(text)
-        
-        # 过滤有效候选
-        valid_candidates = [
-            c for c in candidates 
-            if self.is_valid_placename(c)
-        ]
+        # 从文本中重新提取候选地名，边扫描边验证：
+        # 原地名有效且出现在候选中则保留，否则取首个有效候选；结论确定即停止扫描
+        original_valid = self.is_valid_placename(original)
+        first_valid = None
+        for match in _CANDIDATE_RE.finditer(text):
+            candidate = match.group(1)
+            if not self.is_valid_placename(candidate):
+                continue
+            if candidate == original:
+                first_valid = None
+                break
+            if first_valid is None:
+                first_valid = candidate
+                if not original_valid:
+                    break
         
         # 选择最佳地名
-        if valid_candidates:
-            if original not in valid_candidates or not self.is_valid_placename(original):
-                record.placename = valid_candidates[0]
+        if first_valid is not None:
+            record.placename = first_valid
         
         # 如果最终地名无效，返回None
         if not self.is_valid_placename(record.placename):
@@ -192,24 +204,33 @@ class PlaceNameExtractor:
 
     def is_valid_placename(self, name: str) -> bool:
         """验证地名是否有效"""
-        if not (2 <= len(name) <= 4):
-            return False
-        if any(name.startswith(w) for w in self.STOP_START_WORDS):
-            return False
-        if not any(name.endswith(s) for s in self.PLACE_SUFFIXES):
-            return False
-        return True
+        return (
+            2 <= len(name) <= 4
+            and name[0] not in self._STOP_SET
+            and name[-1] in self._SUFFIX_SET
+        )
 
     def save_to_csv(self, records: List[PlaceNameRecord], output_file: str):
         """保存记录到CSV"""
         with open(output_file, "w", encoding="utf-8-sig", newline="") as f:
             writer = csv.writer(f)
             writer.writerow(["placename", "text", "source"])
-            for record in records:
-                writer.writerow([record.placename, record.text, record.source])
+            writer.writerows((r.placename, r.text, r.source) for r in records)
         
         print(f"已保存 {len(records)} 条记录到 {output_file}")
 
+
+# 预编译正则（依赖上面的类常量，模块加载时只编译一次）
+_LINE_RE = re.compile(r"^\s*(\S(?:.*\S)?)", re.MULTILINE)
+_LEADING_NUM_RE = re.compile(r"\d*\s*")
+# 前缀链：朝代（按长度降序，保证“後漢”“元魏”先于单字朝代）| 行政区划（如"某某郡"）| 动词，顺带吞掉其后的分隔符
+_PREFIX_CHAIN_RE = re.compile(
+    rf"(?:{'|'.join(PlaceNameExtractor._DYN_TUPLE)}"
+    rf"|[一-龥]{{1,2}}(?:{'|'.join(PlaceNameExtractor.ADMIN_LEVELS)})"
+    rf"|{'|'.join(PlaceNameExtractor.PREFIX_VERBS)})[ ；，。]*"
+)
+_CANDIDATE_RE = re.compile(rf"([一-龥]{{1,2}}(?:{'|'.join(PlaceNameExtractor.PLACE_SUFFIXES)}))")
+
 def main():
     INPUT_DIR = Config.DATABASE_DIR
     OUTPUT_CSV = Config.PLACENAME_RECORDS
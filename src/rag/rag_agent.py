@@ -19,6 +19,7 @@ from langgraph.graph import StateGraph, END
 from datetime import datetime
 import json
 import re
+import functools
 
 # 导入模块
 from agent_modules.agent_state import AgentState
@@ -26,6 +27,10 @@ from agent_modules.tools import ResearchTools
 
 Config.setup_environment()
 
+# 关键词检测：多个关键词合并为一个预编译正则，一次扫描代替逐词 in 判断
+PRONOUN_RE = re.compile("|".join(["这个", "那个", "它", "该", "此", "其", "這個", "那個"]))
+STATISTICAL_KEYWORD_RE = re.compile("|".join(["占比", "比例", "分布", "统计", "数量", "可视化", "图表"]))
+
 
 # ==================== Agent Core ====================
 
@@ -40,6 +45,9 @@ class AgentCore:
         self.insights_csv = insights_csv
         self.converter_t2s = converter_t2s
         self.SIMILARITY_THRESHOLD = similarity_threshold
+        
+        # 检索结果按(查询, k)缓存：重复提问时跳过分词与BM25打分
+        self._cached_bm25_search = functools.lru_cache(maxsize=1024)(self._bm25_search)
     
     @traceable(name="Node_Intent_Classification")
     def intent_classification_node(self, state: Dict) -> Dict:
@@ -94,8 +102,7 @@ class AgentCore:
         intent = state.get("intent", "specific_place")
         
         # 检测代词
-        pronouns = ["这个", "那个", "它", "该", "此", "其", "這個", "那個"]
-        has_pronoun = any(p in user_query for p in pronouns)
+        has_pronoun = PRONOUN_RE.search(user_query) is not None
         
         # 如果是followup或包含代词 → 从历史提取
         if (intent == "followup" or has_pronoun) and conversation_history:
@@ -185,7 +192,7 @@ class AgentCore:
         tools_to_call = []
         
         # 统计分析类 - 使用data visualization
-        if intent == "statistical" or any(word in user_query for word in ["占比", "比例", "分布", "统计", "数量", "可视化", "图表"]):
+        if intent == "statistical" or STATISTICAL_KEYWORD_RE.search(user_query):
             tools_to_call.append("data_visualization")
         
         if intent == "tool_request" or "文献" in user_query or "出处" in user_query:
@@ -273,15 +280,10 @@ class AgentCore:
             state["retrieval_similarity"] = 1.0
             return state
         
-        docs_with_sim = self._bm25_search(user_query, k=6)
+        docs_with_sim, max_sim = self._cached_bm25_search(user_query, k=6)
         
-        if docs_with_sim:
-            docs, sims = zip(*docs_with_sim)
-            state["retrieved_docs"] = list(docs)
-            state["retrieval_similarity"] = max(sims)
-        else:
-            state["retrieved_docs"] = []
-            state["retrieval_similarity"] = 0.0
+        state["retrieved_docs"] = [doc for doc, _ in docs_with_sim]
+        state["retrieval_similarity"] = max_sim
         
         state["processing_steps"].append({
             "node": "RAG Retrieval",
@@ -293,7 +295,7 @@ class AgentCore:
         return state
     
     def _bm25_search(self, query: str, k: int = 6):
-        """BM25检索"""
+        """BM25检索，返回 ([(文档, 相似度)], 最高相似度)"""
         query_normalized = self.converter_t2s.convert(query)
         query_tokens = list(jieba.cut(query_normalized))
         
@@ -301,6 +303,7 @@ class AgentCore:
         top_k_indices = bm25_scores.argsort()[-k:][::-1]
         
         results = []
+        max_sim = 0.0
         for idx in top_k_indices:
             doc_dict = self.bm25_documents[idx]
             score = bm25_scores[idx]
@@ -327,8 +330,9 @@ class AgentCore:
                 similarity = max(0.3, score * 0.06)
             
             results.append((doc, similarity))
+            max_sim = max(max_sim, similarity)
         
-        return results
+        return results, max_sim
     
     def _format_conversation_history(self, history: List[Dict]) -> str:
         """格式化历史"""
@@ -390,6 +394,7 @@ class RAGAgent:
         self.bm25 = None
         self.bm25_documents = []
         self.tools = None
+        self._insights_text = None
         
         # 使用外部传入的conversation_history引用
         self._external_conversation_history = conversation_history if conversation_history is not None else []
@@ -401,8 +406,11 @@ class RAGAgent:
         """设置系统"""
         print("🔧 正在初始化RAG Agent系统...")
         
+        # 数据CSV只解析一次，BM25索引与研究工具共用同一个DataFrame
+        data_df = self._load_data()
+        
         print("🔍 构建BM25索引...")
-        self._build_bm25_index()
+        self._build_bm25_index(data_df)
         
         self.llm = ChatOpenAI(
             model=Config.RAG_MODEL,
@@ -411,7 +419,11 @@ class RAGAgent:
             streaming=True
         )
         
-        self.tools = ResearchTools(self.data_csv)
+        self.tools = ResearchTools(self.data_csv, df=data_df)
+        
+        # 统计洞察报告在会话内不变，预先读入并格式化
+        if os.path.exists(self.insights_csv):
+            self._load_insights_text()
         
         self.agent_core = AgentCore(
             llm=self.llm,
@@ -431,23 +443,33 @@ class RAGAgent:
         print(f"🧰 工具数量: 5 个研究工具")
         print(f"💭 记忆容量: 保留最近5轮对话")
     
-    def _build_bm25_index(self):
-        """构建BM25索引"""
+    def _load_data(self):
+        """读取分类结果CSV，文件不存在时返回None"""
         if not os.path.exists(self.data_csv):
+            return None
+        return pd.read_csv(self.data_csv, encoding='utf-8-sig').fillna("")
+    
+    def _build_bm25_index(self, df):
+        """构建BM25索引"""
+        if df is None:
             return
         
-        df = pd.read_csv(self.data_csv, encoding='utf-8-sig').fillna("")
         filtered_df = df[df['resolution_type'].isin(['STRONG', 'WEAK'])]
         
-        tokenized_docs = []
+        # 直接按列构建，避免iterrows逐行装箱为Series
+        self.bm25_documents.extend(filtered_df.to_dict('records'))
+        combined_docs = [
+            f"{placename} {text}"
+            for placename, text in filtered_df[['placename', 'text']].itertuples(index=False, name=None)
+        ]
         
-        for idx, row in filtered_df.iterrows():
-            placename = self.converter_t2s.convert(row['placename'])
-            text = self.converter_t2s.convert(row['text'])
-            combined = f"{placename} {text}"
-            tokens = list(jieba.cut(combined))
-            tokenized_docs.append(tokens)
-            self.bm25_documents.append(row.to_dict())
+        # 整个语料拼接后一次完成繁简转换，避免逐条调用OpenCC
+        normalized_docs = self.converter_t2s.convert("\n".join(combined_docs)).split("\n")
+        if len(normalized_docs) != len(combined_docs):
+            # 文本自身含换行时无法按行拆回，退回逐条转换
+            normalized_docs = [self.converter_t2s.convert(doc) for doc in combined_docs]
+        
+        tokenized_docs = [jieba.lcut(doc) for doc in normalized_docs]
         
         self.bm25 = BM25Okapi(tokenized_docs)
         print(f"  ✓ BM25索引构建完成 ({len(self.bm25_documents)} 条)")
@@ -575,6 +597,12 @@ class RAGAgent:
             "final_state": final_state
         }
     
+    def _load_insights_text(self) -> str:
+        """读取统计洞察报告并缓存其文本形式"""
+        if self._insights_text is None:
+            self._insights_text = pd.read_csv(self.insights_csv).to_string()
+        return self._insights_text
+    
     def _build_answer_prompt(self, state: Dict) -> str:
         """构建prompt（完整保留）"""
         user_query = state["user_query"]
@@ -584,8 +612,7 @@ class RAGAgent:
         tool_results = state.get("tool_results", {})
         
         if intent == "statistical":
-            insights_df = pd.read_csv(self.insights_csv)
-            context = "以下是全量数据的统计洞察报告：\n" + insights_df.to_string()
+            context = "以下是全量数据的统计洞察报告：\n" + self._load_insights_text()
             return f"根据以下统计信息回答问题：\n\n{context}\n\n问题：{user_query}"
         
         if retrieval_similarity < self.SIMILARITY_THRESHOLD: